@@ -1,9 +1,11 @@
-from typing import List, Optional, Literal
+from typing import Literal
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 
 class InputDataModel(BaseModel):
-    keywords: List[str]
-    proxies: Optional[List[str]] = None
+    model_config = ConfigDict(frozen=True, extra='forbid', str_strip_whitespace=True)
+
+    keywords: list[str]
+    proxies: list[str] | None = None
     type: Literal['repositories', 'issues', 'wikis']
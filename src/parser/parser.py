@@ -1,18 +1,44 @@
 import asyncio
-from typing import Any, Coroutine
-from urllib.parse import (
-    urljoin,
-    urlencode,
-    quote_plus,
-    urlparse,
-    urlunparse,
-    ParseResult
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable
+from urllib.parse import urljoin, quote_plus, urlsplit, SplitResult
+
+from httpx import AsyncClient, Response, ConnectError, ConnectTimeout, HTTPStatusError, Limits, ReadTimeout, Timeout
+from lxml import etree
+from tenacity import (
+    retry,
+    retry_if_exception,
+    stop_after_attempt,
+    wait_exponential_jitter
+)
+
+from .utils import HTML_PARSER_OPTIONS, get_proxy, parse_repository_page
+
+_SEARCH_RESULT_HREF_XPATH = etree.XPath(
+    "self::a[parent::*[contains(concat(' ', normalize-space(@class), ' '), ' search-title ')]]/@href",
+    smart_strings=False
 )
+_STREAM_CHUNK_SIZE = 64 * 1024
+_MAX_CONCURRENT_REQUESTS = 20
+_USER_AGENT = (
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0.0.0 Safari/537.36'
+)
+_NETWORK_ERRORS = (ConnectTimeout, ConnectError, ReadTimeout)
+_RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+def _is_transient_error(error: BaseException) -> bool:
+    if isinstance(error, HTTPStatusError):
+        return error.response.status_code in _RETRYABLE_STATUS_CODES
+    return isinstance(error, _NETWORK_ERRORS)
 
-from bs4 import BeautifulSoup
-from httpx import AsyncClient, Response, ConnectError, ConnectTimeout
 
-from .utils import get_proxy, extract_repository_owner, extract_language_statistics
+_retry_transient_errors = retry(
+    stop=stop_after_attempt(5),
+    wait=wait_exponential_jitter(initial=0.2),
+    retry=retry_if_exception(_is_transient_error),
+    reraise=True
+)
 
 
 class Parser:
@@ -26,49 +52,157 @@ class Parser:
 
     def __init__(self, base_url: str, input_data: dict[str, Any]):
         self.base_url: str = base_url
-        self.headers: dict = {'Accept': 'text/html'}
+        self.headers: dict = {
+            'Accept': 'text/html',
+            'Accept-Language': 'en',
+            'User-Agent': _USER_AGENT
+        }
         self.input_data: dict[str, Any] = input_data
+        split_base_url: SplitResult = urlsplit(base_url)
+        self._base_origin: str = f'{split_base_url.scheme}://{split_base_url.netloc}'
+        self._search_url_prefix: str = f'{base_url.rstrip("/")}/search?q='
+        search_type: str = input_data['type'].lower()
+        self._is_repository_search: bool = search_type == 'repositories'
+        self._search_url_suffix: str = f'&type={quote_plus(search_type)}'
+        self._proxy: str | None = None
+        self._clients: dict[str | None, AsyncClient] = {}
+        self._request_semaphore: asyncio.Semaphore = asyncio.Semaphore(_MAX_CONCURRENT_REQUESTS)
+
+    def create_client(self, proxy: str | None) -> AsyncClient:
+        """
+        Creates an HTTP/2 keep-alive client routed through the given proxy.
+        Args:
+            proxy (str | None): The proxy URL, or None for a direct connection.
+        Returns:
+            AsyncClient: The HTTPX client.
+        """
+        return AsyncClient(
+            proxy=proxy,
+            http2=True,
+            follow_redirects=True,
+            limits=Limits(max_connections=100, max_keepalive_connections=_MAX_CONCURRENT_REQUESTS, keepalive_expiry=300),
+            timeout=Timeout(10.0)
+        )
 
+    def get_client(self) -> AsyncClient:
+        """
+        Returns the client for the current proxy, creating it on first use.
+        Returns:
+            AsyncClient: The HTTPX client shared by every request through the current proxy.
+        """
+        if (client := self._clients.get(self._proxy)) is None:
+            client = self._clients[self._proxy] = self.create_client(self._proxy)
+        return client
+
+    async def aclose(self) -> None:
+        """
+        Closes every client opened by the parser.
+        """
+        await asyncio.gather(*(client.aclose() for client in self._clients.values()))
+        self._clients.clear()
+
+    async def __aenter__(self) -> 'Parser':
+        """
+        Picks the first proxy, so no request made inside the block goes out directly
+        while proxies are configured.
+        Returns:
+            Parser: The parser itself.
+        """
+        self.rotate_proxy()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.aclose()
+
+    def rotate_proxy(self, failed_proxy: str | None = None) -> None:
+        """
+        Replaces the current proxy with another one from the input data.
+        The proxy is only replaced while it is still the one that failed, so requests
+        failing together on the same proxy rotate it once instead of undoing each other.
+        Args:
+            failed_proxy (str | None): The proxy the failed request went through, None before the first pick.
+        """
+        if self._proxy == failed_proxy:
+            self._proxy = get_proxy(self.input_data, exclude=failed_proxy)
+
+    @asynccontextmanager
+    async def proxied_client(self) -> AsyncIterator[AsyncClient]:
+        """
+        Yields the client for the current proxy and rotates away from that proxy
+        if the request made with it fails with a network error, a rate limit or a server error.
+        Yields:
+            AsyncClient: The HTTPX client for the current proxy.
+        """
+        proxy: str | None = self._proxy
+        try:
+            yield self.get_client()
+        except Exception as error:
+            if _is_transient_error(error):
+                self.rotate_proxy(proxy)
+            raise
+
+    @_retry_transient_errors
     async def fetch_url_content(self, url: str, headers: dict) -> Response:
         """
-        Fetch content from a given URL with retries and proxies.
+        Fetch content from a given URL, retrying connection failures, read timeouts, rate limiting (429)
+        and server errors (5xx) with exponential backoff and jitter. Any other unsuccessful status is raised
+        at once, so an error page is never parsed as a repository.
+        The proxy a failed attempt used is rotated out before the retry. At most as many requests
+        as the client keeps alive connections are in flight at once; backoff sleeps do not hold a slot.
         Args:
             url (str): The URL to fetch content from.
             headers (dict): The headers to include in the request.
         Returns:
             Response: The HTTPX response object containing the fetched content.
         Raises:
-            ConnectTimeout: If the connection times out.
-            ConnectError: If there is a connection error.
+            ConnectTimeout: If the connection times out on every attempt.
+            ConnectError: If there is a connection error on every attempt.
+            ReadTimeout: If reading the response times out on every attempt.
+            HTTPStatusError: If the response status is not successful after redirects, or stays
+                             retryable on every attempt.
         """
-        proxy: str | None = get_proxy(self.input_data)
-        async with AsyncClient(proxy=proxy) as client:
-            try:
-                return await client.get(url, headers=headers)
-
-            except (ConnectTimeout, ConnectError):
-                await self.fetch_url_content(url, headers)
+        async with self._request_semaphore, self.proxied_client() as client:
+            response: Response = await client.get(url, headers=headers)
+            response.raise_for_status()
+            return response
 
-    async def parse_github_data(self, urls: list[str]) -> list[dict[str, Any]]:
+    async def parse_github_data(
+        self,
+        urls: list[str],
+        pending: dict[str, asyncio.Task[Response]] | None = None
+    ) -> list[dict[str, Any]]:
         """
         Parses repository data from the given list of URLs.
         Args:
             urls (list[str]): A list of repository URLs.
+            pending (dict[str, asyncio.Task[Response]] | None): Fetches already started, keyed by URL.
         Returns:
             list[dict[str, Any]]: A list of dictionaries containing parsed repository data.
         """
-        parsed_data_list: list[dict[str, Any]] = []
-        soups: list[BeautifulSoup] = await self.fetch_html_soups(urls)
-        for soup, url in zip(soups, urls):
-            parsed_data: dict[str, Any] = {'url': url}
-            if self.input_data['type'] == 'repositories':
-                parsed_data.update({'extra': {
-                    'owner': extract_repository_owner(soup),
-                    'language_stats': extract_language_statistics(soup)
-                }})
-            parsed_data_list.append(parsed_data)
+        parsed_data_list: list[dict[str, Any]] = [{'url': url} for url in urls]
+        if not self._is_repository_search:
+            return parsed_data_list
+
+        async def parse_extra(index: int, content: bytes) -> None:
+            parsed_data_list[index].update({'extra': await self.extract_repository_data(content)})
+
+        parse_tasks: list[asyncio.Task] = []
+        async for index, response in self.iter_responses(urls, pending):
+            parse_tasks.append(asyncio.create_task(parse_extra(index, response.content)))
+        await asyncio.gather(*parse_tasks)
         return parsed_data_list
 
+    async def extract_repository_data(self, content: bytes) -> dict[str, Any]:
+        """
+        Extracts repository owner and language statistics from a repository page.
+        Pages are parsed on a worker thread, where libxml2 runs without the GIL.
+        Args:
+            content (bytes): The raw body of the repository page.
+        Returns:
+            dict[str, Any]: A dictionary containing the owner and the language statistics.
+        """
+        return await asyncio.to_thread(parse_repository_page, content)
+
     def build_search_url(self, keywords: list) -> str:
         """
         Constructs a search URL for the given keyword.
@@ -77,37 +211,96 @@ class Parser:
         Returns:
             str: The constructed search URL.
         """
-        url: str = urljoin(self.base_url, 'search')
-        parsed_url: ParseResult = urlparse(url)
-        params: dict[str, str] = {
-            'q': quote_plus(' '.join(keywords)),
-            'type': self.input_data['type'].lower()
-        }
-        return urlunparse((parsed_url.scheme, parsed_url.netloc, parsed_url.path, '', urlencode(params, safe='+'), ''))
+        return self._search_url_prefix + quote_plus(' '.join(keywords)) + self._search_url_suffix
 
-    async def fetch_html_soups(self, urls: list[str]) -> list[BeautifulSoup]:
+    async def iter_responses(
+        self,
+        urls: list[str],
+        pending: dict[str, asyncio.Task[Response]] | None = None
+    ) -> AsyncIterator[tuple[int, Response]]:
         """
-        Creates BeautifulSoup data from the given list of URLs.
+        Fetches the given list of URLs concurrently, yielding each response as soon as it arrives.
         Args:
             urls (list[str]): A list of URLs.
+            pending (dict[str, asyncio.Task[Response]] | None): Fetches already started, keyed by URL.
+                                                              They are awaited instead of fetching again.
+        Yields:
+            tuple[int, Response]: The index of the URL in the list and its response, in completion order.
+        """
+        pending = pending or {}
+
+        async def fetch(index: int, url: str) -> tuple[int, Response]:
+            if url in pending:
+                return index, await pending[url]
+            return index, await self.fetch_url_content(url, self.headers)
+
+        for completed in asyncio.as_completed([fetch(index, url) for index, url in enumerate(urls)]):
+            yield await completed
+
+    def resolve_url(self, href: str) -> str:
+        """
+        Resolves a link found on a page against the base URL.
+        Root-relative links, which is what search results use, are joined by concatenation.
+        Args:
+            href (str): The link to resolve.
         Returns:
-            list[BeautifulSoup]: A list of BeautifulSoup's.
+            str: The absolute URL.
         """
-        coros: list[Coroutine[Any, Any, Response]] = [self.fetch_url_content(url, self.headers) for url in urls]
-        responses = await asyncio.gather(*coros)
-        return [BeautifulSoup(response.text, 'lxml') for response in responses]
+        if href.startswith('/') and not href.startswith('//'):
+            return self._base_origin + href
+        return urljoin(self.base_url, href)
+
+    @_retry_transient_errors
+    async def stream_search_results(self, url: str, on_result: Callable[[str], None]) -> None:
+        """
+        Streams a search page and reports every result link as soon as its tag is parsed.
+        A retried stream reports the links seen before the failure again.
+        Args:
+            url (str): The search URL.
+            on_result (Callable[[str], None]): Called with the href of each search result.
+        Raises:
+            HTTPStatusError: If the search page status is not successful, as in fetch_url_content.
+        """
+        parser: etree.HTMLPullParser = etree.HTMLPullParser(events=('start',), tag='a', **HTML_PARSER_OPTIONS)
+        async with self.proxied_client() as client, client.stream('GET', url, headers=self.headers) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(_STREAM_CHUNK_SIZE):
+                parser.feed(chunk)
+                for _, anchor in parser.read_events():
+                    for href in _SEARCH_RESULT_HREF_XPATH(anchor):
+                        on_result(href)
+        parser.close()
+        for _, anchor in parser.read_events():
+            for href in _SEARCH_RESULT_HREF_XPATH(anchor):
+                on_result(href)
 
     async def gather_data(self) -> list[dict[str, Any]]:
         """
         Parses data for the specified keywords.
+        Repository fetches start while the search page is still being downloaded, once per
+        repository URL stripped of its query, fragment and trailing slash. Pages are only
+        fetched for repository searches, the only type whose pages are parsed.
         Returns:
             list[dict[str, Any]]: A list of dictionaries containing parsed data.
         """
         url: str = self.build_search_url(self.input_data['keywords'])
-        response: Response = await self.fetch_url_content(url, self.headers)
-        soup: BeautifulSoup = BeautifulSoup(response.text, 'lxml')
-        repo_urls: list[str] = [urljoin(self.base_url, item['href']) for item in soup.select('.search-title > a')]
-        github_data: list[dict[str, Any]] = await self.parse_github_data(repo_urls)
+        repo_urls: dict[str, None] = {}
+        pending: dict[str, asyncio.Task[Response]] = {}
+
+        def dispatch(href: str) -> None:
+            repo_url: str = self.resolve_url(href.split('?', 1)[0].split('#', 1)[0].rstrip('/'))
+            if repo_url not in repo_urls:
+                repo_urls[repo_url] = None
+                if self._is_repository_search:
+                    pending[repo_url] = asyncio.create_task(self.fetch_url_content(repo_url, self.headers))
+
+        try:
+            await self.stream_search_results(url, dispatch)
+        except BaseException:
+            for task in pending.values():
+                task.cancel()
+            raise
+        github_data: list[dict[str, Any]] = await self.parse_github_data(list(repo_urls), pending)
         return github_data
 
     async def run_crawler(self) -> list[dict[str, Any]]:
@@ -116,4 +309,5 @@ class Parser:
         Returns:
             list[dict[str, Any]]: A list of dictionaries containing parsed data.
         """
-        return await self.gather_data()
+        async with self:
+            return await self.gather_data()
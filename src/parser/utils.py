@@ -1,45 +1,89 @@
+import threading
 from random import choice
 from typing import Any
 
-from bs4 import BeautifulSoup
+from lxml import etree, html
 
+_LANG_STATS_ROWS_XPATH = etree.XPath(
+    "//*[contains(concat(' ', normalize-space(@class), ' '), ' d-inline-flex ')"
+    " and contains(concat(' ', normalize-space(@class), ' '), ' flex-items-center ')]"
+)
+_LANG_STATS_SPANS_XPATH = etree.XPath('span')
+_OWNER_XPATH = etree.XPath("string(//meta[@name='octolytics-dimension-user_login']/@content)", smart_strings=False)
+HTML_PARSER_OPTIONS: dict[str, bool] = {'remove_comments': True, 'remove_pis': True, 'collect_ids': False}
+_html_parsers: threading.local = threading.local()
 
-def get_proxy(input_data) -> str | None:
+
+def get_proxy(input_data, exclude: str | None = None) -> str | None:
     """
     Retrieve a proxy URL from the given input data.
     Args:
         input_data (dict[str, Any]): A dictionary containing input data,
                                      including a possible list of proxies.
+        exclude (Optional[str]): A proxy URL that just failed, avoided unless it is the only one available.
     Returns:
         Optional[str]: A formatted proxy URL if proxies are available, otherwise None.
     """
     if proxies := input_data['proxies']:
-        return f'http://{choice(proxies)}'
+        candidates = [proxy for proxy in proxies if f'http://{proxy}' != exclude] or proxies
+        return f'http://{choice(candidates)}'
 
     return None
 
 
-def extract_language_statistics(soup: BeautifulSoup) -> dict[str, Any]:
+def extract_language_statistics(tree: html.HtmlElement) -> dict[str, Any]:
     """
-    Extracts language statistics from the given HTML elements.
+    Extracts language statistics from the given HTML tree.
+    Each row maps the text of its first span to the text of its second; rows with fewer spans are skipped.
     Args:
-        soup: BeautifulSoup
+        tree: html.HtmlElement
     Returns:
         dict[str, Any]: A dictionary containing the language statistics.
     """
     lang_stats_data: dict[str, Any] = {}
-    for item in soup.select('.d-inline-flex.flex-items-center'):
-        language_stats = item.select('span')
-        lang_stats_data[language_stats[0].text] = language_stats[1].text
+    for row in _LANG_STATS_ROWS_XPATH(tree):
+        language_stats = _LANG_STATS_SPANS_XPATH(row)
+        if len(language_stats) >= 2:
+            lang_stats_data[language_stats[0].text_content()] = language_stats[1].text_content()
     return lang_stats_data
 
 
-def extract_repository_owner(soup: BeautifulSoup) -> str:
+def extract_repository_owner(tree: html.HtmlElement) -> str:
+    """
+    Extracts repository owner from the given HTML tree.
+    Args:
+        tree: html.HtmlElement
+    Returns:
+        str: A string containing the repository owner, empty if the page has none.
+    """
+    return _OWNER_XPATH(tree)
+
+
+def parse_html_document(content: bytes) -> html.HtmlElement:
+    """
+    Parses an HTML document, dropping comments and processing instructions and skipping the ID index.
+    Each thread gets its own parser, since lxml serializes parses that share one.
+    Args:
+        content (bytes): The raw HTML document.
+    Returns:
+        html.HtmlElement: The parsed HTML tree.
+    """
+    if (parser := getattr(_html_parsers, 'parser', None)) is None:
+        parser = _html_parsers.parser = html.HTMLParser(**HTML_PARSER_OPTIONS)
+    return html.fromstring(content, parser=parser)
+
+
+def parse_repository_page(content: bytes) -> dict[str, Any]:
     """
-    Extracts repository owner from the given HTML elements.
+    Extracts repository owner and language statistics from a repository page.
+    A body with no elements, such as an empty one, yields no owner and no languages.
     Args:
-        soup: BeautifulSoup
+        content (bytes): The raw body of the repository page.
     Returns:
-        str: A string containing the repository owner.
+        dict[str, Any]: A dictionary containing the owner and the language statistics.
     """
-    return soup.select_one('[name=\'octolytics-dimension-user_login\']')['content']
+    try:
+        tree: html.HtmlElement = parse_html_document(content)
+    except etree.ParserError:
+        return {'owner': '', 'language_stats': {}}
+    return {'owner': extract_repository_owner(tree), 'language_stats': extract_language_statistics(tree)}
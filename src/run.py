@@ -1,15 +1,18 @@
 import asyncio
 import sys
 from argparse import ArgumentParser
-from json import load, dumps, JSONDecodeError
 from typing import Any
 
+import orjson
 from loguru import logger
 from pydantic import ValidationError
 
 from parser.models import InputDataModel
 from parser.parser import Parser
 
+if sys.platform != 'win32':
+    import uvloop
+
 
 class GitHubCrawler:
     base_url: str = 'https://github.com/'
@@ -28,31 +31,30 @@ class GitHubCrawler:
     async def main(self):
         args = self.parse_args()
         try:
-            with open(args.file_path, 'r') as json_file:
-                data = load(json_file)
+            with open(args.file_path, 'rb') as json_file:
+                data = orjson.loads(json_file.read())
         except FileNotFoundError:
             logger.error(f'File not found: {args.file_path}')
             return
 
-        except JSONDecodeError:
+        except orjson.JSONDecodeError:
             logger.error(f'Error decoding JSON from file: {args.file_path}')
             return
 
         try:
-            validated_data = InputDataModel(**data)
+            validated_data = InputDataModel.model_validate(data)
         except ValidationError as e:
             raise e
 
-        input_data: dict[str, Any] = {
-            'keywords': validated_data.keywords,
-            'proxies': validated_data.proxies,
-            'type': validated_data.type,
-        }
+        input_data: dict[str, Any] = validated_data.model_dump()
         parser: Parser = Parser(self.base_url, input_data)
         parsed_data = await parser.run_crawler()
-        with open('parse_result.json', 'w') as file:
-            file.write(dumps(parsed_data, indent=4))
+        with open('parse_result.json', 'wb') as file:
+            file.write(orjson.dumps(parsed_data, option=orjson.OPT_INDENT_2))
 
 
 if __name__ == '__main__':
-    asyncio.run(GitHubCrawler().main())
+    if sys.platform != 'win32':
+        uvloop.run(GitHubCrawler().main())
+    else:
+        asyncio.run(GitHubCrawler().main())
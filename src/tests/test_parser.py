@@ -1,8 +1,9 @@
+import asyncio
 from unittest import IsolatedAsyncioTestCase
 from unittest.mock import AsyncMock, patch, MagicMock, call
 
-from bs4 import BeautifulSoup
-from httpx import AsyncClient, ConnectTimeout, Response
+from httpx import AsyncClient, ConnectTimeout, HTTPStatusError, MockTransport, ReadTimeout, Request, Response
+from tenacity import wait_none
 
 from src.parser.parser import Parser
 
@@ -20,34 +21,152 @@ class TestParser(IsolatedAsyncioTestCase):
         self.parser = Parser(self.base_url, self.input_data)
         self.client = AsyncMock(AsyncClient)
 
-    @patch('src.parser.parser.get_proxy', return_value='proxy')
-    @patch('src.parser.parser.AsyncClient')
-    async def test_fetch_url_content_success(self, mock_client, mock_get_proxy):
-        mock_client = mock_client.return_value.__aenter__.return_value
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_client.get = AsyncMock(return_value=mock_response)
+    @staticmethod
+    async def completed_responses(urls, pending=None):
+        for index in reversed(range(len(urls))):
+            yield index, Response(200, content=f'<html>{urls[index]}</html>'.encode())
+
+    async def test_fetch_url_content_success(self):
+        mock_response = Response(200, content=b'<html></html>', request=Request('GET', self.base_url))
+        self.client.get = AsyncMock(return_value=mock_response)
+        self.parser._clients = {None: self.client}
         response = await self.parser.fetch_url_content(self.base_url, self.headers)
-        mock_client.get.assert_awaited_once_with(self.base_url, headers=self.headers)
-        mock_get_proxy.assert_called_once()
+        self.client.get.assert_awaited_once_with(self.base_url, headers=self.headers)
         self.assertEqual(response.status_code, 200)
         self.assertEqual(response, mock_response)
 
-    @patch('src.parser.parser.get_proxy', return_value=None)
-    @patch('src.parser.parser.AsyncClient')
-    async def test_fetch_url_content_retry_on_exception(self, mock_client, mock_get_proxy):
+    @patch.object(Parser.fetch_url_content.retry, 'wait', wait_none())
+    @patch('src.parser.parser.get_proxy', return_value='http://proxy2')
+    async def test_fetch_url_content_retry_on_exception(self, mock_get_proxy):
         connect_timeout_error = ConnectTimeout('Connect timeout', request=None)
-        mock_response = AsyncMock(spec=Response)
-        mock_response.status_code = 200
-        mock_client.return_value.__aenter__.return_value.get.side_effect = [
-            connect_timeout_error,
-            AsyncMock(spec=Response)
-        ]
-        await self.parser.fetch_url_content(self.base_url, self.headers)
-        self.assertEqual(mock_client.return_value.__aenter__.return_value.get.call_count, 2)
-        calls = [call(self.base_url, headers=self.headers)] * 2
-        mock_client.return_value.__aenter__.return_value.get.assert_has_calls(calls)
-        mock_get_proxy.assert_has_calls([call(self.input_data), call(self.input_data)])
+        self.client.get = AsyncMock(side_effect=connect_timeout_error)
+        retry_client = AsyncMock(AsyncClient)
+        retry_client.get = AsyncMock(return_value=Response(200, request=Request('GET', self.base_url)))
+        self.parser._clients = {None: self.client, 'http://proxy2': retry_client}
+        response = await self.parser.fetch_url_content(self.base_url, self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.client.get.assert_awaited_once_with(self.base_url, headers=self.headers)
+        retry_client.get.assert_awaited_once_with(self.base_url, headers=self.headers)
+        mock_get_proxy.assert_called_once_with(self.input_data, exclude=None)
+
+    @patch('src.parser.parser.get_proxy', return_value='http://proxy2')
+    def test_rotate_proxy_skips_already_rotated_proxy(self, mock_get_proxy):
+        self.parser._proxy = 'http://proxy2'
+        self.parser.rotate_proxy('http://proxy1')
+        self.assertEqual(self.parser._proxy, 'http://proxy2')
+        mock_get_proxy.assert_not_called()
+
+    @patch.object(Parser.fetch_url_content.retry, 'wait', wait_none())
+    async def test_concurrent_failures_move_off_dead_proxy(self):
+        async def connect_timeout(url, headers):
+            await asyncio.sleep(0)
+            raise ConnectTimeout('Connect timeout', request=None)
+
+        dead_client = AsyncMock(AsyncClient)
+        dead_client.get = AsyncMock(side_effect=connect_timeout)
+        healthy_client = AsyncMock(AsyncClient)
+        healthy_client.get = AsyncMock(return_value=Response(200, request=Request('GET', self.base_url)))
+        self.parser._clients = {'http://proxy1': dead_client, 'http://proxy2': healthy_client}
+        self.parser._proxy = 'http://proxy1'
+        responses = await asyncio.gather(*(self.parser.fetch_url_content(self.base_url, self.headers) for _ in range(4)))
+        self.assertTrue(all(response.status_code == 200 for response in responses))
+        self.assertEqual(dead_client.get.await_count, 4)
+        self.assertEqual(healthy_client.get.await_count, 4)
+        self.assertEqual(self.parser._proxy, 'http://proxy2')
+
+    @patch.object(Parser.fetch_url_content.retry, 'wait', wait_none())
+    async def test_fetch_url_content_retry_on_read_timeout(self):
+        self.client.get = AsyncMock(
+            side_effect=[ReadTimeout('Read timeout', request=None), Response(200, request=Request('GET', self.base_url))]
+        )
+        self.input_data['proxies'] = None
+        self.parser._clients = {None: self.client}
+        response = await self.parser.fetch_url_content(self.base_url, self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get.await_count, 2)
+
+    @patch.object(Parser.fetch_url_content.retry, 'wait', wait_none())
+    async def test_fetch_url_content_gives_up_after_retries(self):
+        self.client.get = AsyncMock(side_effect=ConnectTimeout('Connect timeout', request=None))
+        self.input_data['proxies'] = None
+        self.parser._clients = {None: self.client}
+        with self.assertRaises(ConnectTimeout):
+            await self.parser.fetch_url_content(self.base_url, self.headers)
+        self.assertEqual(self.client.get.await_count, 5)
+
+    @patch.object(Parser.fetch_url_content.retry, 'wait', wait_none())
+    async def test_fetch_url_content_retries_rate_limit(self):
+        request = Request('GET', self.base_url)
+        self.client.get = AsyncMock(side_effect=[Response(429, request=request), Response(200, request=request)])
+        self.input_data['proxies'] = None
+        self.parser._clients = {None: self.client}
+        response = await self.parser.fetch_url_content(self.base_url, self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get.await_count, 2)
+
+    async def test_fetch_url_content_raises_error_status(self):
+        self.client.get = AsyncMock(return_value=Response(404, request=Request('GET', self.base_url)))
+        self.parser._clients = {None: self.client}
+        with self.assertRaises(HTTPStatusError):
+            await self.parser.fetch_url_content(self.base_url, self.headers)
+        self.assertEqual(self.client.get.await_count, 1)
+
+    @patch('src.parser.parser._MAX_CONCURRENT_REQUESTS', 2)
+    async def test_fetch_url_content_bounds_concurrency(self):
+        parser = Parser(self.base_url, self.input_data)
+        in_flight = 0
+        max_in_flight = 0
+
+        async def get(url, headers):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0)
+            in_flight -= 1
+            return Response(200, request=Request('GET', url))
+
+        self.client.get = AsyncMock(side_effect=get)
+        parser._clients = {None: self.client}
+        await asyncio.gather(*(parser.fetch_url_content(self.base_url, self.headers) for _ in range(5)))
+        self.assertEqual(max_in_flight, 2)
+        self.assertEqual(self.client.get.await_count, 5)
+
+    @patch('src.parser.parser.AsyncClient')
+    def test_create_client(self, mock_client):
+        client = self.parser.create_client('http://proxy1')
+        self.assertEqual(client, mock_client.return_value)
+        kwargs = mock_client.call_args.kwargs
+        self.assertEqual(kwargs['proxy'], 'http://proxy1')
+        self.assertTrue(kwargs['http2'])
+        self.assertTrue(kwargs['follow_redirects'])
+
+    @patch.object(Parser, 'create_client')
+    def test_get_client_reused_per_proxy(self, mock_create_client):
+        mock_create_client.side_effect = lambda proxy: MagicMock(proxy=proxy)
+        self.parser._proxy = 'http://proxy1'
+        first = self.parser.get_client()
+        self.assertIs(self.parser.get_client(), first)
+        self.parser._proxy = 'http://proxy2'
+        second = self.parser.get_client()
+        self.assertIsNot(second, first)
+        mock_create_client.assert_has_calls([call('http://proxy1'), call('http://proxy2')])
+
+    async def test_context_manager_closes_clients(self):
+        other_client = AsyncMock(AsyncClient)
+        async with self.parser as parser:
+            parser._clients = {None: self.client, 'http://proxy1': other_client}
+        self.client.aclose.assert_awaited_once()
+        other_client.aclose.assert_awaited_once()
+        self.assertEqual(self.parser._clients, {})
+
+    @patch.object(Parser, 'create_client')
+    async def test_context_manager_picks_proxy(self, mock_create_client):
+        mock_create_client.return_value = self.client
+        self.input_data['proxies'] = ['proxy1:8080']
+        async with self.parser as parser:
+            parser.get_client()
+            self.assertEqual(list(parser._clients), ['http://proxy1:8080'])
+        mock_create_client.assert_called_once_with('http://proxy1:8080')
 
     def test_build_search_url(self):
         keywords = ['testkeyword', 'testkeyword2']
@@ -55,10 +174,21 @@ class TestParser(IsolatedAsyncioTestCase):
         actual_url = self.parser.build_search_url(keywords)
         self.assertEqual(expected_url, actual_url)
 
-    @patch('src.parser.parser.extract_repository_owner', return_value='test_owner')
-    @patch('src.parser.parser.extract_language_statistics', return_value={'Python': '100%'})
-    @patch.object(Parser, 'fetch_html_soups', return_value=['test_resp1', 'test_reps2'])
-    async def test_parse_github_data_repos(self, mock_fetch_html_soups, mock_get_lang_stats, mock_get_owner):
+    def test_build_search_url_quotes_keywords_once(self):
+        expected_url = 'https://github.com/search?q=c%2B%2B+%26+rust&type=repositories'
+        actual_url = self.parser.build_search_url(['c++', '&', 'rust'])
+        self.assertEqual(expected_url, actual_url)
+
+    def test_build_search_url_quotes_unicode_keywords(self):
+        expected_url = 'https://github.com/search?q=r%C3%A9sum%C3%A9+parser&type=repositories'
+        actual_url = self.parser.build_search_url(['résumé parser'])
+        self.assertEqual(expected_url, actual_url)
+
+    @patch.object(Parser, 'extract_repository_data',
+                  return_value={'owner': 'test_owner', 'language_stats': {'Python': '100%'}})
+    @patch.object(Parser, 'iter_responses')
+    async def test_parse_github_data_repos(self, mock_iter_responses, mock_extract_repository_data):
+        mock_iter_responses.side_effect = self.completed_responses
         urls = ['http://test_url1', 'http://test_url2']
         result = await self.parser.parse_github_data(urls)
         expected_result = [
@@ -78,15 +208,18 @@ class TestParser(IsolatedAsyncioTestCase):
             }
         ]
         self.assertEqual(result, expected_result)
-        mock_fetch_html_soups.assert_awaited()
-        mock_get_lang_stats.assert_called()
-        mock_get_owner.assert_called()
-
-    @patch('src.parser.parser.extract_repository_owner', return_value='test_owner')
-    @patch('src.parser.parser.extract_language_statistics', return_value={'Python': '100%'})
-    @patch.object(Parser, 'fetch_html_soups', return_value=['test_resp1', 'test_reps2'])
-    async def test_parse_github_data_issues(self, mock_fetch_html_soups, mock_get_lang_stats, mock_get_owner):
+        mock_iter_responses.assert_called_once_with(urls, None)
+        mock_extract_repository_data.assert_has_calls(
+            [call(b'<html>http://test_url1</html>'), call(b'<html>http://test_url2</html>')], any_order=True
+        )
+        self.assertEqual(mock_extract_repository_data.call_count, 2)
+
+    @patch.object(Parser, 'extract_repository_data')
+    @patch.object(Parser, 'iter_responses')
+    async def test_parse_github_data_issues(self, mock_iter_responses, mock_extract_repository_data):
+        mock_iter_responses.side_effect = self.completed_responses
         self.input_data['type'] = 'issues'
+        self.parser = Parser(self.base_url, self.input_data)
         urls = ['http://test_url1', 'http://test_url2']
         result = await self.parser.parse_github_data(urls)
         expected_result = [
@@ -98,23 +231,23 @@ class TestParser(IsolatedAsyncioTestCase):
             }
         ]
         self.assertEqual(result, expected_result)
-        mock_fetch_html_soups.assert_awaited()
-        mock_get_lang_stats.assert_not_called()
-        mock_get_owner.assert_not_called()
+        mock_iter_responses.assert_not_called()
+        mock_extract_repository_data.assert_not_called()
+
+    def serve_search_page(self, content):
+        self.parser._clients = {None: AsyncClient(transport=MockTransport(lambda request: Response(200, content=content)))}
 
     @patch.object(Parser, 'parse_github_data')
     @patch.object(Parser, 'fetch_url_content')
     async def test_gather_data(self, mock_fetch_url_content, mock_parse_github_data):
-        search_response = MagicMock()
-        search_response.text = '''
+        self.serve_search_page(b'''
         <html>
             <div class='search-title'>
                 <a href='/test_repo1'></a>
                 <a href='/test_repo2'></a>
             </div>
         </html>
-        '''
-        mock_fetch_url_content.return_value = search_response
+        ''')
         expected_result = [
             {
                 'url': 'https://github.com/test_repo1',
@@ -134,32 +267,129 @@ class TestParser(IsolatedAsyncioTestCase):
         mock_parse_github_data.return_value = expected_result
         result = await self.parser.gather_data()
         self.assertEqual(result, expected_result)
-        mock_fetch_url_content.assert_awaited()
-        mock_parse_github_data.assert_awaited()
+        urls, pending = mock_parse_github_data.await_args.args
+        await asyncio.gather(*pending.values())
+        mock_fetch_url_content.assert_has_awaits([
+            call('https://github.com/test_repo1', self.parser.headers),
+            call('https://github.com/test_repo2', self.parser.headers)
+        ])
+        self.assertEqual(urls, ['https://github.com/test_repo1', 'https://github.com/test_repo2'])
+        self.assertEqual(list(pending), urls)
+
+    @patch.object(Parser, 'parse_github_data', return_value=[])
+    @patch.object(Parser, 'fetch_url_content')
+    async def test_gather_data_resolves_and_dedupes_hrefs(self, mock_fetch_url_content, mock_parse_github_data):
+        self.serve_search_page(b'''
+        <html>
+            <div class='search-title'>
+                <a href='/owner/repo'></a>
+                <a href='https://example.com/owner/other'></a>
+                <a href='//example.org/owner/third'></a>
+                <a href='/owner/repo'></a>
+                <a href='/owner/repo/?tab=readme#start'></a>
+            </div>
+            <a href='/not/a/result'></a>
+        </html>
+        ''')
+        await self.parser.gather_data()
+        urls, pending = mock_parse_github_data.await_args.args
+        await asyncio.gather(*pending.values())
+        self.assertEqual(urls, [
+            'https://github.com/owner/repo',
+            'https://example.com/owner/other',
+            'https://example.org/owner/third'
+        ])
+        self.assertEqual(mock_fetch_url_content.await_count, 3)
+
+    @patch.object(Parser, 'parse_github_data', return_value=[])
+    @patch.object(Parser, 'fetch_url_content')
+    async def test_gather_data_issues_skips_page_fetches(self, mock_fetch_url_content, mock_parse_github_data):
+        self.input_data['type'] = 'issues'
+        self.parser = Parser(self.base_url, self.input_data)
+        self.serve_search_page(b"<html><div class='search-title'><a href='/owner/repo/issues/1'></a></div></html>")
+        await self.parser.gather_data()
+        mock_parse_github_data.assert_awaited_once_with(['https://github.com/owner/repo/issues/1'], {})
+        mock_fetch_url_content.assert_not_called()
 
+    @patch('src.parser.parser._STREAM_CHUNK_SIZE', 16)
+    async def test_stream_search_results(self):
+        self.serve_search_page(
+            b"<html><div class='search-title'><a href='/owner/repo1'></a></div>"
+            b"<div class='search-title'><a href='/owner/repo2'></a></div></html>"
+        )
+        hrefs = []
+        await self.parser.stream_search_results(self.base_url, hrefs.append)
+        self.assertEqual(hrefs, ['/owner/repo1', '/owner/repo2'])
+
+    async def test_stream_search_results_raises_error_status(self):
+        self.parser._clients = {None: AsyncClient(transport=MockTransport(lambda request: Response(404)))}
+        hrefs = []
+        with self.assertRaises(HTTPStatusError):
+            await self.parser.stream_search_results(self.base_url, hrefs.append)
+        self.assertEqual(hrefs, [])
+
+    @patch.object(Parser, 'create_client')
     @patch.object(Parser, 'gather_data')
-    async def test_run_crawler(self, mock_gather_data):
-        mock_response = AsyncMock(return_value=[{'key': 'value'}])
-        mock_gather_data.return_value = mock_response
+    async def test_run_crawler(self, mock_gather_data, mock_create_client):
+        mock_create_client.return_value = self.client
+        mock_response = [{'key': 'value'}]
+
+        async def gather_data():
+            self.parser.get_client()
+            return mock_response
+
+        mock_gather_data.side_effect = gather_data
         result = await self.parser.run_crawler()
         assert result == mock_response
+        mock_create_client.assert_called_once()
+        self.client.aclose.assert_awaited_once()
+        self.assertEqual(self.parser._clients, {})
 
+    @patch('src.parser.parser.parse_repository_page',
+           return_value={'owner': 'test_owner', 'language_stats': {'Python': '100%'}})
+    async def test_extract_repository_data(self, mock_parse_repository_page):
+        content = b'<html></html>'
+        result = await self.parser.extract_repository_data(content)
+        self.assertEqual(result, {'owner': 'test_owner', 'language_stats': {'Python': '100%'}})
+        mock_parse_repository_page.assert_called_once_with(content)
+
+    @patch.object(Parser, 'extract_repository_data', return_value={'owner': 'test_owner', 'language_stats': {}})
     @patch.object(Parser, 'fetch_url_content')
-    async def test_fetch_html_soups(self, mock_fetch_url_content):
-        def mock_response(text):
-            mock_resp = MagicMock()
-            mock_resp.text = text
-            return mock_resp
-
-        response_texts = [
-            '<html><body>Content 1</body></html>',
-            '<html><body>Content 2</body></html>'
-        ]
-        mock_fetch_url_content.side_effect = [mock_response(text) for text in response_texts]
+    async def test_parse_github_data_fetches_concurrently(self, mock_fetch_url_content, mock_extract_repository_data):
+        urls = [f'https://github.com/owner/repo{index}' for index in range(3)]
+        all_started = asyncio.Event()
+
+        async def fetch(url, headers):
+            if mock_fetch_url_content.await_count == len(urls):
+                all_started.set()
+            await all_started.wait()
+            return Response(200)
+
+        mock_fetch_url_content.side_effect = fetch
+        result = await asyncio.wait_for(self.parser.parse_github_data(urls), timeout=1)
+        self.assertEqual([item['url'] for item in result], urls)
+        self.assertEqual(mock_fetch_url_content.await_count, len(urls))
+        self.assertEqual(mock_extract_repository_data.await_count, len(urls))
+
+    @patch.object(Parser, 'fetch_url_content')
+    async def test_iter_responses(self, mock_fetch_url_content):
+        responses = {'https://example.com/slow': Response(200), 'https://example.com/fast': Response(200)}
+
+        async def fetch(url, headers):
+            await asyncio.sleep(0.01 if url.endswith('slow') else 0)
+            return responses[url]
+
+        mock_fetch_url_content.side_effect = fetch
+        urls = list(responses)
+        result = [item async for item in self.parser.iter_responses(urls)]
+        self.assertEqual(result, [(1, responses[urls[1]]), (0, responses[urls[0]])])
+
+    @patch.object(Parser, 'fetch_url_content')
+    async def test_iter_responses_awaits_pending_fetches(self, mock_fetch_url_content):
+        prefetched = Response(200)
+        pending = {'https://example.com/page1': asyncio.ensure_future(asyncio.sleep(0, prefetched))}
+        mock_fetch_url_content.return_value = Response(200)
         urls = ['https://example.com/page1', 'https://example.com/page2']
-        soups = await self.parser.fetch_html_soups(urls)
-        self.assertIsInstance(soups, list)
-        self.assertEqual(len(soups), 2)
-        self.assertTrue(all(isinstance(soup, BeautifulSoup) for soup in soups))
-        self.assertEqual(soups[0].text, 'Content 1')
-        self.assertEqual(soups[1].text, 'Content 2')
+        result = dict([item async for item in self.parser.iter_responses(urls, pending)])
+        self.assertIs(result[0], prefetched)
+        mock_fetch_url_content.assert_awaited_once_with('https://example.com/page2', self.parser.headers)
@@ -1,9 +1,15 @@
 from unittest import TestCase
 from unittest.mock import patch
 
-from bs4 import BeautifulSoup
+from lxml import html
 
-from src.parser.utils import get_proxy, extract_language_statistics, extract_repository_owner
+from src.parser.utils import (
+    get_proxy,
+    extract_language_statistics,
+    extract_repository_owner,
+    parse_html_document,
+    parse_repository_page
+)
 
 
 class TestUtils(TestCase):
@@ -28,6 +34,23 @@ class TestUtils(TestCase):
         result = get_proxy(input_data)
         self.assertEqual(result, 'http://proxy1')
 
+    def test_proxies_exclude_current(self):
+        input_data = {
+            'keywords': ['example'],
+            'proxies': ['proxy1', 'proxy2'],
+            'type': 'example'
+        }
+        for _ in range(10):
+            self.assertEqual(get_proxy(input_data, exclude='http://proxy1'), 'http://proxy2')
+
+    def test_proxies_exclude_only_proxy(self):
+        input_data = {
+            'keywords': ['example'],
+            'proxies': ['proxy1'],
+            'type': 'example'
+        }
+        self.assertEqual(get_proxy(input_data, exclude='http://proxy1'), 'http://proxy1')
+
     def test_proxies_absent(self):
         input_data = {
             'keywords': ['example'],
@@ -38,7 +61,7 @@ class TestUtils(TestCase):
         self.assertIsNone(result)
 
     def test_extract_language_statistics(self):
-        html = '''
+        html_content = '''
         <div class='d-inline-flex flex-items-center'>
             <span>Python</span><span>50%</span>
         </div>
@@ -49,17 +72,68 @@ class TestUtils(TestCase):
             <span>Java</span><span>20%</span>
         </div>
         '''
-        soup = BeautifulSoup(html, 'lxml')
+        tree = html.fromstring(html_content)
         expected_result = {
             'Python': '50%',
             'JavaScript': '30%',
             'Java': '20%'
         }
-        actual_result = extract_language_statistics(soup)
+        actual_result = extract_language_statistics(tree)
+        self.assertEqual(expected_result, actual_result)
+
+    def test_extract_language_statistics_keeps_rows_apart(self):
+        html_content = '''
+        <div class='d-inline-flex flex-items-center'>
+            <span><b>Python</b></span><span>50%</span>
+        </div>
+        <div class='d-inline-flex flex-items-center'>
+            <span>Rust</span>
+        </div>
+        <div class='d-inline-flex flex-items-center'>
+            <span></span><span>5%</span><span>extra</span>
+        </div>
+        <div class='d-inline-flex flex-items-center'>
+            <span>Go</span><span>45%</span>
+        </div>
+        '''
+        tree = html.fromstring(html_content)
+        expected_result = {
+            'Python': '50%',
+            '': '5%',
+            'Go': '45%'
+        }
+        actual_result = extract_language_statistics(tree)
         self.assertEqual(expected_result, actual_result)
 
     def test_extract_repository_owner(self):
         html_content = '<html><head><meta name=\'octolytics-dimension-user_login\' content=\'testuser\'></head></html>'
-        soup = BeautifulSoup(html_content, 'lxml')
-        owner = extract_repository_owner(soup)
+        tree = html.fromstring(html_content)
+        owner = extract_repository_owner(tree)
         self.assertEqual(owner, 'testuser')
+
+    def test_extract_repository_owner_missing(self):
+        tree = html.fromstring('<html><head><title>Not Found</title></head></html>')
+        self.assertEqual(extract_repository_owner(tree), '')
+
+    def test_parse_html_document_drops_comments(self):
+        tree = parse_html_document(b'<html><body><!-- note --><p id="x">Content</p></body></html>')
+        self.assertEqual(tree.text_content(), 'Content')
+        self.assertEqual(len(tree.xpath('//comment()')), 0)
+
+    def test_parse_repository_page(self):
+        content = (
+            b'<html><head><meta name="octolytics-dimension-user_login" content="page_user"></head>'
+            b'<body><div class="d-inline-flex flex-items-center"><span>Go</span><span>100%</span></div></body></html>'
+        )
+        expected_result = {'owner': 'page_user', 'language_stats': {'Go': '100%'}}
+        self.assertEqual(parse_repository_page(content), expected_result)
+
+    def test_parse_repository_page_without_language_bar(self):
+        content = b'<html><head><meta name="octolytics-dimension-user_login" content="empty_user"></head></html>'
+        expected_result = {'owner': 'empty_user', 'language_stats': {}}
+        self.assertEqual(parse_repository_page(content), expected_result)
+
+    def test_parse_repository_page_empty_body(self):
+        expected_result = {'owner': '', 'language_stats': {}}
+        self.assertEqual(parse_repository_page(b''), expected_result)
+        self.assertEqual(parse_repository_page(b'<!-- rate limited -->'), expected_result)